@@ -0,0 +1,306 @@
+"""
+Keep-alive HTTP(S) connection pool shared by the streaming test scripts.
+
+Imported as a sibling module: running a script from scripts/ puts this
+directory first on sys.path. Python stdlib only.
+"""
+
+from __future__ import annotations
+
+import base64
+import http.client
+import socket
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Same User-Agent urllib sent, so server/CDN behaviour matches earlier runs.
+USER_AGENT = "Python-urllib/%d.%d" % sys.version_info[:2]
+
+# Redirects followed for GET/HEAD, with urllib's limit on chain length.
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+MAX_REDIRECTS = 10
+
+# Methods that may be re-sent after the server drops a reused connection, as
+# repeating them cannot repeat a side effect.
+SAFE_METHODS = frozenset({"GET", "HEAD"})
+
+
+@lru_cache(maxsize=256)
+def split_url(url: str) -> Tuple[str, str, str]:
+    """(scheme, host[:port], path?query) of url; cached since test URLs repeat."""
+    parts = urllib.parse.urlsplit(url)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    return parts.scheme, parts.netloc, target
+
+
+class _KeepAliveMixin:
+    """Enable TCP keepalive so a long-idle cached connection notices a dead peer.
+
+    http.client already sets TCP_NODELAY on connect, so small range requests
+    are not held back by Nagle's algorithm.
+    """
+
+    sock: socket.socket
+
+    def connect(self) -> None:
+        super().connect()  # type: ignore[misc]
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+
+class KeepAliveHTTPConnection(_KeepAliveMixin, http.client.HTTPConnection):
+    pass
+
+
+@lru_cache(maxsize=1)
+def default_tls_context() -> ssl.SSLContext:
+    """Verifying context used when none is given, shared so sessions resume."""
+    ctx = ssl.create_default_context()
+    # Same ALPN offer http.client makes with its own per-connection contexts.
+    ctx.set_alpn_protocols(["http/1.1"])
+    return ctx
+
+
+class KeepAliveHTTPSConnection(KeepAliveHTTPConnection):
+    """
+    HTTPS counterpart of KeepAliveHTTPConnection that also resumes TLS.
+
+    The TCP part, including any CONNECT tunnel, is plain HTTPConnection; the
+    socket is then wrapped with this connection's own context. The last
+    session seen for a server is offered on the next handshake to it, so
+    connections opened after the first skip the full handshake when the
+    server supports resumption.
+    """
+
+    default_port = http.client.HTTPS_PORT
+
+    # (server host[:port], context) -> last session; item assignment is atomic.
+    _sessions: Dict[Tuple[str, ssl.SSLContext], ssl.SSLSession] = {}
+
+    def __init__(
+        self,
+        host: str,
+        timeout: float,
+        context: Optional[ssl.SSLContext] = None,
+        server: Optional[str] = None,
+    ) -> None:
+        """server is the host[:port] TLS is negotiated with when host is a proxy."""
+        super().__init__(host, timeout=timeout)
+        self.tls_context = context if context is not None else default_tls_context()
+        self.server = server or host
+        self.server_hostname = urllib.parse.urlsplit("//" + self.server).hostname
+        self.session_key = (self.server, self.tls_context)
+
+    def connect(self) -> None:
+        super().connect()
+        self.sock = self.tls_context.wrap_socket(
+            self.sock,
+            server_hostname=self.server_hostname,
+            session=self._sessions.get(self.session_key),
+        )
+
+    def save_session(self) -> None:
+        """Remember this connection's session; TLS 1.3 sends it after the handshake."""
+        session = getattr(self.sock, "session", None)
+        if session is not None:
+            self._sessions[self.session_key] = session
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive HTTP(S) connections.
+
+    Idle connections are kept per (scheme, host, TLS context) and shared by
+    every thread, so repeated requests to the same server skip the TCP + TLS
+    handshake and timings reflect the server rather than connection setup.
+    As with urllib, GET/HEAD redirects are followed and the *_proxy
+    environment variables are honoured.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._idle: Dict[tuple, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._proxies = urllib.request.getproxies()
+        self._routes: Dict[Tuple[str, str], Optional[Tuple[str, Dict[str, str]]]] = {}
+
+    def _route(self, scheme: str, netloc: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """(proxy host[:port], proxy auth headers) for this server, or None to go direct."""
+        key = (scheme, netloc)
+        if key in self._routes:
+            return self._routes[key]
+        route = None
+        proxy = self._proxies.get(scheme)
+        if proxy and not urllib.request.proxy_bypass(netloc):
+            parts = urllib.parse.urlsplit(proxy if "://" in proxy else "http://" + proxy)
+            auth = {}
+            if parts.username is not None:
+                credentials = "%s:%s" % (
+                    urllib.parse.unquote(parts.username),
+                    urllib.parse.unquote(parts.password or ""),
+                )
+                token = base64.b64encode(credentials.encode()).decode("ascii")
+                auth["Proxy-Authorization"] = "Basic " + token
+            route = (parts.netloc.rpartition("@")[2], auth)
+        self._routes[key] = route
+        return route
+
+    def _get(self, key: tuple, timeout_s: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused) for key, opening one if none is idle."""
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is not None:
+            conn.timeout = timeout_s
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout_s)
+            return conn, True
+        return self._new(key, timeout_s), False
+
+    def _new(self, key: tuple, timeout_s: float) -> http.client.HTTPConnection:
+        scheme, netloc, ssl_context = key
+        route = self._route(scheme, netloc)
+        if scheme == "https":
+            if route is None:
+                return KeepAliveHTTPSConnection(netloc, timeout_s, ssl_context)
+            # TLS to the server runs inside a CONNECT tunnel through the proxy.
+            conn = KeepAliveHTTPSConnection(route[0], timeout_s, ssl_context, server=netloc)
+            conn.set_tunnel(netloc, headers=route[1])
+            return conn
+        return KeepAliveHTTPConnection(netloc if route is None else route[0], timeout=timeout_s)
+
+    def _put(self, key: tuple, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def fill(
+        self,
+        url: str,
+        count: int,
+        timeout_s: float,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> List[float]:
+        """
+        Connect in parallel until `count` connections to url's server are idle.
+        Returns the setup time of each connection opened.
+        """
+        scheme, netloc, _ = split_url(url)
+        key = (scheme, netloc, ssl_context)
+        with self._lock:
+            missing = min(count, self.maxsize) - len(self._idle.get(key, ()))
+        if missing <= 0:
+            return []
+
+        def open_one() -> float:
+            conn = self._new(key, timeout_s)
+            connect_start = time.perf_counter()
+            conn.connect()
+            elapsed = time.perf_counter() - connect_start
+            self._put(key, conn)
+            return elapsed
+
+        with ThreadPoolExecutor(max_workers=missing) as pool:
+            futures = [pool.submit(open_one) for _ in range(missing)]
+            return [f.result() for f in futures]
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        timeout_s: float,
+        ssl_context: Optional[ssl.SSLContext],
+        body: Optional[bytes],
+    ) -> Tuple[tuple, http.client.HTTPConnection, http.client.HTTPResponse, float]:
+        """One request/response exchange for request(), without following redirects."""
+        scheme, netloc, target = split_url(url)
+        key = (scheme, netloc, ssl_context)
+        route = self._route(scheme, netloc)
+        if route is not None and scheme == "http":
+            # Plain HTTP proxies take the absolute URL as the request target.
+            target = url
+            headers = {**headers, **route[1]}
+        while True:
+            conn, reused = self._get(key, timeout_s)
+            sent = False
+            try:
+                connect_s = 0.0
+                if not reused:
+                    connect_start = time.perf_counter()
+                    conn.connect()
+                    connect_s = time.perf_counter() - connect_start
+                conn.request(method, target, body=body, headers=headers)
+                sent = True
+                return key, conn, conn.getresponse(), connect_s
+            except ConnectionError:
+                conn.close()
+                # Once fully sent, a POST may already have been handled.
+                if not reused or (sent and method not in SAFE_METHODS):
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        timeout_s: float,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        body: Optional[bytes] = None,
+    ) -> Tuple[tuple, http.client.HTTPConnection, http.client.HTTPResponse, float]:
+        """
+        Send a request and return (key, connection, response, connect_s) once
+        headers arrive; connect_s is the TCP + TLS setup time, 0.0 on reuse.
+        A reused connection the server has already closed is retried on another,
+        unless a non-GET/HEAD request was already fully sent on it.
+        GET/HEAD redirects are followed; any other redirected method raises
+        http.client.HTTPException naming the target instead of being re-sent.
+        Hand the connection back with release() after reading the response.
+        """
+        headers = {"User-Agent": USER_AGENT, **headers}
+        total_connect_s = 0.0
+        for _ in range(MAX_REDIRECTS + 1):
+            key, conn, resp, connect_s = self._send(method, url, headers, timeout_s, ssl_context, body)
+            total_connect_s += connect_s
+            location = resp.getheader("Location") if resp.status in REDIRECT_STATUSES else None
+            if location is None:
+                return key, conn, resp, total_connect_s
+            resp.read()
+            self.release(key, conn, resp)
+            target = urllib.parse.urljoin(url, location)
+            if method not in SAFE_METHODS:
+                raise http.client.HTTPException(
+                    f"{method} {url} was redirected (HTTP {resp.status}) to {target}; not followed"
+                )
+            if urllib.parse.urlsplit(target).scheme not in ("http", "https"):
+                raise http.client.HTTPException(f"redirect from {url} to unsupported URL {target}")
+            url = target
+        raise http.client.HTTPException(f"more than {MAX_REDIRECTS} redirects, last to {url}")
+
+    def release(
+        self,
+        key: tuple,
+        conn: http.client.HTTPConnection,
+        resp: http.client.HTTPResponse,
+    ) -> None:
+        """Keep conn for reuse if resp was fully read and allows it; else close it."""
+        if isinstance(conn, KeepAliveHTTPSConnection):
+            conn.save_session()
+        if resp.will_close or not resp.isclosed():
+            conn.close()
+            return
+        self._put(key, conn)
@@ -1,83 +1,336 @@
 #!/usr/bin/env python3
 """Quick analyzer for test results JSON files."""
-import json, sys
+import json, math, os, re, sys
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, DefaultDict, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
 
-def analyze(path):
-    with open(path) as f:
-        data = json.load(f)
-    
-    results = data["results"]
-    print(f"File: {path}")
-    print(f"Timestamp: {data['timestamp']}")
-    print(f"Base URL: {data['base_url']}")
-    print(f"Concurrency: {data['concurrency']}")
-    print(f"Total results: {len(results)}")
-    print()
-
-    by_label = defaultdict(list)
+try:
+    from mypy_extensions import mypyc_attr
+except ImportError:  # only mypyc needs it; plain CPython runs without
+    def mypyc_attr(*attrs: str, **kwattrs: object) -> Any:  # type: ignore[misc]
+        return lambda cls: cls
+
+try:
+    import orjson  # optional: parses large result files several times faster
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+# Files at least this large are decoded one result record at a time, from
+# pieces of at least STREAM_CHUNK characters read as the previous is used up.
+STREAM_MIN_BYTES = 256 * 1024 * 1024
+STREAM_CHUNK = 1024 * 1024
+
+_WS = re.compile(r"[ \t\n\r]*")
+_decode = json.JSONDecoder().raw_decode
+
+Record = Dict[str, Any]
+
+
+def skip_ws(text: str, pos: int) -> int:
+    """Index of the first non-whitespace character at or after pos."""
+    m = _WS.match(text, pos)
+    assert m is not None  # the pattern also matches the empty string
+    return m.end()
+
+
+# Report lines, filled from the flat tuples returned by summary().
+TTFB_LINE = "  TTFB  -> min=%.0fms  avg=%.0fms  max=%.0fms  p50=%.0fms  p95=%.0fms\n"
+RATE_LINE = "  Rate  -> min=%.2f  avg=%.2f  max=%.2f  p50=%.2f MB/s\n"
+TOTAL_LINE = "  Total -> min=%.0fms  avg=%.0fms  max=%.0fms\n"
+OVERALL_TTFB_LINE = "  TTFB  -> min=%.0fms  avg=%.0fms  max=%.0fms  p95=%.0fms\n"
+RAMP_LINE = "  %10s: ok=%2d  avg_ttfb=%7.0fms  avg_rate=%.2f MB/s  agg_rate=%.2f MB/s\n"
+
+
+# mypyc cannot compile a subclass of array as a native class; keeping it a
+# regular Python class still lets the rest of the module be compiled.
+@mypyc_attr(native_class=False)
+class Samples(array):
+    """Kept metric values as unboxed doubles; reduced once when summarized.
+
+    Create with new_samples(), which fixes the "d" typecode.
+    """
+
+    def summary(self, qs: Tuple[float, ...] = ()) -> Tuple[float, ...]:
+        """Return (min, avg, max, *values at sorted index int(n*q) for qs).
+
+        Needs a non-empty column. With qs, the column is sorted once and min,
+        max and every quantile are read from that sorted list; without qs
+        nothing is sorted and min and max are a plain pass each. All values
+        are exact.
+        """
+        n = len(self)
+        ks = [int(n * q) for q in qs]
+        if not ks:
+            return min(self), math.fsum(self) / n, max(self)
+        s = sorted(self)
+        return (s[0], math.fsum(s) / n, s[-1], *[s[k] for k in ks])
+
+
+def new_samples() -> Samples:
+    return Samples("d")
+
+
+class Running:
+    """O(1) count/sum/min/max for a metric that never needs percentiles."""
+
+    __slots__ = ("n", "total", "lo", "hi")
+
+    def __init__(self) -> None:
+        self.n: int = 0
+        self.total: float = 0.0
+        self.lo: float = math.inf
+        self.hi: float = -math.inf
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        self.total += x
+        if x < self.lo:
+            self.lo = x
+        if x > self.hi:
+            self.hi = x
+
+    def merge(self, other: "Running") -> None:
+        self.n += other.n
+        self.total += other.total
+        self.lo = min(self.lo, other.lo)
+        self.hi = max(self.hi, other.hi)
+
+    def summary(self) -> Tuple[float, float, float]:
+        return self.lo, self.total / self.n, self.hi
+
+
+@dataclass
+class LabelAgg:
+    n_ok: int = 0
+    ttfb: Samples = field(default_factory=new_samples)
+    rate: Samples = field(default_factory=new_samples)
+    elapsed: Running = field(default_factory=Running)
+    n_fail: int = 0
+    statuses: Set[Optional[int]] = field(default_factory=set)
+    # Distinct error texts in first-seen order; truncated when reported.
+    errors: Dict[str, None] = field(default_factory=dict)
+
+    def merge(self, other: "LabelAgg") -> None:
+        """Fold another aggregate's counts and samples into this one."""
+        self.n_ok += other.n_ok
+        self.n_fail += other.n_fail
+        self.ttfb.extend(other.ttfb)
+        self.rate.extend(other.rate)
+        self.elapsed.merge(other.elapsed)
+        self.statuses |= other.statuses
+        self.errors.update(other.errors)
+
+
+def aggregate(results: Iterable[Record]) -> Tuple[Dict[str, LabelAgg], LabelAgg]:
+    """Fold results into per-label aggregates in one pass, plus their merge.
+
+    Each record is classified once; all per-value work is array.append or a
+    few comparisons. Times are kept in seconds as recorded and converted to
+    milliseconds only when reported. The overall aggregate is built
+    afterwards by merging the per-label ones, which costs O(samples)
+    copying rather than another scan.
+    """
+    by_label: DefaultDict[str, LabelAgg] = defaultdict(LabelAgg)
     for r in results:
-        by_label[r["test_label"]].append(r)
+        agg = by_label[r["test_label"]]
+        status = r.get("status")
+        error = r.get("error")
+        if (status == 200 or status == 206) and error is None:
+            agg.n_ok += 1
+            ttfb = r.get("ttfb_s")
+            if ttfb:
+                agg.ttfb.append(ttfb)
+            rate = r.get("throughput_mbps")
+            if rate:
+                agg.rate.append(rate)
+            agg.elapsed.add(r["elapsed_s"])
+        else:
+            agg.n_fail += 1
+            agg.statuses.add(status)
+            # Keyed by text: error values may be unhashable (e.g. objects).
+            agg.errors[str(error) if "error" in r else "?"] = None
+    overall = LabelAgg()
+    for agg in by_label.values():
+        overall.merge(agg)
+    return by_label, overall
+
+
+class TextStream:
+    """Window over a text file that is refilled as it is consumed.
+
+    Only the unconsumed tail of the last piece read is held, plus whatever
+    value spans the piece boundary while it is being decoded.
+    """
+
+    def __init__(self, f: TextIO) -> None:
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0  # file position of buf[0], for error messages
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Drop consumed text and append the next piece; False at end of file."""
+        if self.eof:
+            return False
+        # Read at least as much as is pending so a value spanning many
+        # pieces is retried a logarithmic number of times, not linear.
+        piece = self.f.read(max(STREAM_CHUNK, len(self.buf) - self.pos))
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + piece
+        self.pos = 0
+        self.eof = not piece
+        return not self.eof
+
+    def peek(self) -> str:
+        """Next non-whitespace character, not consumed; "" at end of file."""
+        while True:
+            self.pos = skip_ws(self.buf, self.pos)
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        """Consume and return the next character, which must be in chars."""
+        c = self.peek()
+        if not c or c not in chars:
+            where = self.offset + self.pos
+            raise ValueError(f"expected {' or '.join(map(repr, chars))} at offset {where}")
+        self.pos += 1
+        return c
+
+    def decode(self) -> Any:
+        """Decode the next JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer end may continue in the
+            # next piece; decode again once the buffer reaches past it.
+            if end < len(self.buf) or not self.fill():
+                self.pos = end
+                return value
+
+
+def iter_results(path: str, meta: Record) -> Iterator[Record]:
+    """Yield the records of the top-level "results" array one at a time.
+
+    Every other top-level key is decoded into meta as it is reached, so meta
+    is complete once the generator is exhausted. The file is read in pieces
+    as it is parsed and only the current record is materialized.
+    """
+    with open(path, encoding="utf-8") as f:
+        s = TextStream(f)
+        if s.peek() != "{":
+            raise ValueError("result file is not a JSON object")
+        s.pos += 1
+        while s.peek() != "}":
+            key = s.decode()
+            s.expect(":")
+            if key == "results" and s.peek() == "[":
+                s.pos += 1
+                if s.peek() == "]":
+                    s.pos += 1
+                else:
+                    sep = ","
+                    while sep == ",":
+                        yield s.decode()
+                        sep = s.expect(",]")
+            else:
+                meta[key] = s.decode()
+            if s.peek() == ",":
+                s.pos += 1
+
+
+def open_results(path: str) -> Tuple[Record, Iterable[Record]]:
+    """Return (metadata, iterable of result records) for a result file."""
+    if os.path.getsize(path) >= STREAM_MIN_BYTES:
+        meta: Record = {}
+        return meta, iter_results(path, meta)
+    with open(path, "rb") as f:
+        raw = f.read()
+    meta = orjson.loads(raw) if orjson else json.loads(raw)
+    return meta, meta.pop("results")
+
+
+def ms(values: Tuple[float, ...]) -> Tuple[float, ...]:
+    """Convert a summary tuple of seconds to milliseconds."""
+    return tuple(v * 1000 for v in values)
+
+
+def report(path: str) -> str:
+    """Return the full text report for one result file."""
+    data, results = open_results(path)
+    by_label, overall = aggregate(results)
+    del results
+    total = overall.n_ok + overall.n_fail
+    out: List[str] = []
+
+    out.append(f"File: {path}\n")
+    out.append(f"Timestamp: {data['timestamp']}\n")
+    out.append(f"Base URL: {data['base_url']}\n")
+    out.append(f"Concurrency: {data['concurrency']}\n")
+    out.append(f"Total results: {total}\n")
+    out.append("\n")
 
     for label in sorted(by_label.keys()):
-        rr = by_label[label]
-        ok = [r for r in rr if r.get("status") in (200, 206) and r.get("error") is None]
-        fail = [r for r in rr if r not in ok]
-        ttfbs = sorted([r["ttfb_s"] * 1000 for r in ok if r.get("ttfb_s")])
-        rates = sorted([r["throughput_mbps"] for r in ok if r.get("throughput_mbps")])
-        elapsed = sorted([r["elapsed_s"] * 1000 for r in ok])
-
-        print(f"[{label}] {len(ok)} OK / {len(fail)} FAIL")
-        if fail:
-            errors = set(str(r.get("error", "?"))[:80] for r in fail)
-            statuses = set(r.get("status") for r in fail)
-            print(f"  Statuses: {statuses}")
-            for e in errors:
-                print(f"  Error: {e}")
-        if ttfbs:
-            p50 = ttfbs[len(ttfbs) // 2]
-            p95 = ttfbs[int(len(ttfbs) * 0.95)]
-            print(f"  TTFB  -> min={min(ttfbs):.0f}ms  avg={sum(ttfbs)/len(ttfbs):.0f}ms  max={max(ttfbs):.0f}ms  p50={p50:.0f}ms  p95={p95:.0f}ms")
-        if rates:
-            p50 = rates[len(rates) // 2]
-            print(f"  Rate  -> min={min(rates):.2f}  avg={sum(rates)/len(rates):.2f}  max={max(rates):.2f}  p50={p50:.2f} MB/s")
-        if elapsed:
-            print(f"  Total -> min={min(elapsed):.0f}ms  avg={sum(elapsed)/len(elapsed):.0f}ms  max={max(elapsed):.0f}ms")
-        print()
+        agg = by_label[label]
+        out.append(f"[{label}] {agg.n_ok} OK / {agg.n_fail} FAIL\n")
+        if agg.n_fail:
+            out.append(f"  Statuses: {agg.statuses}\n")
+            for e in dict.fromkeys(e[:80] for e in agg.errors):
+                out.append(f"  Error: {e}\n")
+        if agg.ttfb:
+            out.append(TTFB_LINE % ms(agg.ttfb.summary((0.5, 0.95))))
+        if agg.rate:
+            out.append(RATE_LINE % agg.rate.summary((0.5,)))
+        if agg.elapsed.n:
+            out.append(TOTAL_LINE % ms(agg.elapsed.summary()))
+        out.append("\n")
 
     # Ramp-up analysis
-    ramp_labels = sorted([l for l in by_label if l.startswith("ramp_c")], key=lambda x: int(x.split("c")[1]))
+    ramp_labels = sorted((int(l.split("c", 1)[1]), l) for l in by_label if l.startswith("ramp_c"))
     if ramp_labels:
-        print("=== RAMP-UP SCALING ===")
-        for label in ramp_labels:
-            rr = by_label[label]
-            ok = [r for r in rr if r.get("status") in (200, 206) and r.get("error") is None]
-            if not ok:
-                print(f"  {label}: ALL FAILED")
+        out.append("=== RAMP-UP SCALING ===\n")
+        for _, label in ramp_labels:
+            agg = by_label[label]
+            if not agg.n_ok:
+                out.append(f"  {label}: ALL FAILED\n")
                 continue
-            ttfbs = [r["ttfb_s"] * 1000 for r in ok if r.get("ttfb_s")]
-            rates = [r["throughput_mbps"] for r in ok]
-            avg_ttfb = sum(ttfbs) / len(ttfbs) if ttfbs else 0
-            avg_rate = sum(rates) / len(rates) if rates else 0
-            agg_rate = sum(rates)
-            print(f"  {label:>10s}: ok={len(ok):>2d}  avg_ttfb={avg_ttfb:>7.0f}ms  avg_rate={avg_rate:.2f} MB/s  agg_rate={agg_rate:.2f} MB/s")
-        print()
+            # Zero rates are not recorded; they add nothing to the sum.
+            agg_rate = math.fsum(agg.rate)
+            avg_ttfb = math.fsum(agg.ttfb) * 1000 / len(agg.ttfb) if agg.ttfb else 0
+            avg_rate = agg_rate / agg.n_ok
+            out.append(RAMP_LINE % (label, agg.n_ok, avg_ttfb, avg_rate, agg_rate))
+        out.append("\n")
 
     # Overall
-    all_ok = [r for r in results if r.get("status") in (200, 206) and r.get("error") is None]
-    all_fail = len(results) - len(all_ok)
-    print(f"=== OVERALL: {len(all_ok)} OK / {all_fail} FAIL / {len(results)} total ===")
-    if all_ok:
-        all_ttfbs = sorted([r["ttfb_s"] * 1000 for r in all_ok if r.get("ttfb_s")])
-        all_rates = sorted([r["throughput_mbps"] for r in all_ok])
-        if all_ttfbs:
-            p95 = all_ttfbs[int(len(all_ttfbs) * 0.95)]
-            print(f"  TTFB  -> min={min(all_ttfbs):.0f}ms  avg={sum(all_ttfbs)/len(all_ttfbs):.0f}ms  max={max(all_ttfbs):.0f}ms  p95={p95:.0f}ms")
-        if all_rates:
-            p50 = all_rates[len(all_rates) // 2]
-            print(f"  Rate  -> min={min(all_rates):.2f}  avg={sum(all_rates)/len(all_rates):.2f}  max={max(all_rates):.2f}  p50={p50:.2f} MB/s")
+    out.append(f"=== OVERALL: {overall.n_ok} OK / {overall.n_fail} FAIL / {total} total ===\n")
+    if overall.ttfb:
+        out.append(OVERALL_TTFB_LINE % ms(overall.ttfb.summary((0.95,))))
+    if overall.rate:
+        out.append(RATE_LINE % overall.rate.summary((0.5,)))
+    return "".join(out)
+
+
+def main(paths: List[str]) -> None:
+    workers = min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        for path in paths:
+            sys.stdout.write(report(path) + "\n")
+        return
+    # Files are independent; parse and aggregate them on separate cores and
+    # print in argument order as each report becomes available.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for text in pool.map(report, paths):
+            sys.stdout.write(text + "\n")
+
 
 if __name__ == "__main__":
-    for path in sys.argv[1:]:
-        analyze(path)
-        print()
+    main(sys.argv[1:])
@@ -13,26 +13,38 @@ Usage:
     python scripts/test_concurrent_performance.py
 
 Dependencies: Python 3.8+ stdlib only (no pip install needed).
+Result records use __slots__ only on Python 3.10+; older versions still work.
+orjson is used for JSON encoding/decoding when it happens to be installed.
 """
 
 from __future__ import annotations
 
 import argparse
+import atexit
 import getpass
+import glob
 import json
 import math
 import os
+import queue
+import re
 import ssl
 import sys
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
-from threading import Lock
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from threading import Lock, Thread, local
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from _http_pool import ConnectionPool
+
+try:
+    import orjson  # optional: faster result-file writes and payload parsing
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 # ---------------------------------------------------------------------------
 # Media IDs extracted from production logs
@@ -61,23 +73,68 @@ FIXED_TIMEOUT_SECONDS = 120.0
 FIXED_ROUNDS = 3
 FIXED_TESTS = ["sequential", "burst", "multi_chunk", "same_media", "ramp_up"]
 
+# Range size used by burst/same_media under --ttfb-only.
+TTFB_ONLY_BYTES = 1024
+
 # Where result files are stored by default.
 DEFAULT_RESULTS_DIR = "scripts"
 
+# Response bodies are read into a reused per-thread buffer of this size.
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Result records are created per request and never changed afterwards, so
+# they are frozen; slots (no per-record __dict__) need Python 3.10+.
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-_print_lock = Lock()
+# Log lines are queued by log() and written by one background thread, so the
+# thread collecting results never waits on the console.
+_log_queue: "queue.Queue[str]" = queue.Queue(maxsize=10000)
+_log_writer: Optional[Thread] = None
+_log_writer_lock = Lock()
+_NON_ALNUM_RUN = re.compile(r"[\W_]+")
+_thread_state = local()
 
 
 def ts() -> str:
     return datetime.now().strftime("%H:%M:%S.%f")[:-3]
 
 
+def _write_logs() -> None:
+    """Writer thread: drain whatever is queued and write it in one call."""
+    while True:
+        batch = [_log_queue.get()]
+        try:
+            while True:
+                batch.append(_log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            sys.stdout.write("".join(batch))
+            sys.stdout.flush()
+        except Exception:
+            pass  # console gone (e.g. closed pipe); keep draining so flush_logs() returns
+        for _ in batch:
+            _log_queue.task_done()
+
+
+def flush_logs() -> None:
+    """Block until every queued log line is written; call before print() or input()."""
+    _log_queue.join()
+
+
 def log(level: str, message: str) -> None:
-    with _print_lock:
-        print(f"{ts()} [{level:>7s}] {message}", flush=True)
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = Thread(target=_write_logs, name="log-writer", daemon=True)
+                _log_writer.start()
+                atexit.register(flush_logs)
+    _log_queue.put(f"{ts()} [{level:>7s}] {message}\n")
 
 
 def hr(char: str = "─", width: int = 100) -> str:
@@ -85,15 +142,8 @@ def hr(char: str = "─", width: int = 100) -> str:
 
 
 def sanitize_filename_part(value: str) -> str:
-    out = []
-    for ch in value.lower():
-        if ch.isalnum():
-            out.append(ch)
-        else:
-            out.append("-")
-    cleaned = "".join(out).strip("-")
-    while "--" in cleaned:
-        cleaned = cleaned.replace("--", "-")
+    # One pass: every run of non-alphanumerics (str.isalnum rules) becomes "-".
+    cleaned = _NON_ALNUM_RUN.sub("-", value.lower()).strip("-")
     return cleaned or "unknown"
 
 
@@ -104,7 +154,11 @@ def prompt_base_url(default_url: str) -> str:
     return base_url.rstrip("/")
 
 
-def make_results_path(base_url: str, results_dir: str = DEFAULT_RESULTS_DIR) -> str:
+def make_results_path(
+    base_url: str,
+    results_dir: str = DEFAULT_RESULTS_DIR,
+    ttfb_only: bool = False,
+) -> str:
     parsed = urllib.parse.urlparse(base_url)
     host = parsed.netloc or parsed.path or "unknown"
     host_tag = sanitize_filename_part(host)
@@ -119,18 +173,16 @@ def make_results_path(base_url: str, results_dir: str = DEFAULT_RESULTS_DIR) ->
         f"_sm{FIXED_SAME_MEDIA_REQUESTS}"
         f"_t{timeout_tag}"
     )
+    if ttfb_only:
+        prefix += "_ttfb"
 
     os.makedirs(results_dir, exist_ok=True)
+    seq_pattern = re.compile(re.escape(prefix) + r"_seq(\d+)\.json")
     max_seq = 0
-    for name in os.listdir(results_dir):
-        if not name.startswith(prefix + "_seq") or not name.endswith(".json"):
-            continue
-        seq_str = name[len(prefix) + 4 : -5]
-        try:
-            seq = int(seq_str)
-            max_seq = max(max_seq, seq)
-        except ValueError:
-            continue
+    for path in glob.iglob(os.path.join(glob.escape(results_dir), glob.escape(prefix) + "_seq*.json")):
+        m = seq_pattern.fullmatch(os.path.basename(path))
+        if m:
+            max_seq = max(max_seq, int(m.group(1)))
 
     next_seq = max_seq + 1
     return os.path.join(results_dir, f"{prefix}_seq{next_seq:03d}.json")
@@ -202,6 +254,23 @@ def make_ssl_context(insecure: bool) -> Optional[ssl.SSLContext]:
 # HTTP helpers
 # ---------------------------------------------------------------------------
 
+# Shared by every request in the run; workers are capped at FIXED_CONCURRENCY.
+_pool = ConnectionPool(maxsize=FIXED_CONCURRENCY)
+
+
+def read_buffer() -> memoryview:
+    """This thread's scratch buffer; bodies are only counted, so it is overwritten freely."""
+    view = getattr(_thread_state, "read_buffer", None)
+    if view is None:
+        view = _thread_state.read_buffer = memoryview(bytearray(READ_BUFFER_SIZE))
+    return view
+
+
+def loads_json(data: bytes):
+    """Decode a UTF-8 JSON response body."""
+    return orjson.loads(data) if orjson else json.loads(data.decode("utf-8"))
+
+
 def http_post_json(
     url: str,
     payload: dict,
@@ -209,24 +278,21 @@ def http_post_json(
     ssl_context: Optional[ssl.SSLContext] = None,
 ) -> Tuple[int, dict]:
     """POST JSON and return (status_code, response_dict)."""
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url=url,
-        data=data,
-        method="POST",
-        headers={"Content-Type": "application/json"},
+    data = orjson.dumps(payload) if orjson else json.dumps(payload).encode("utf-8")
+    key, conn, resp, _ = _pool.request(
+        "POST", url, {"Content-Type": "application/json"}, timeout_s, ssl_context, body=data
     )
     try:
-        with urllib.request.urlopen(req, timeout=timeout_s, context=ssl_context) as resp:
-            body = json.loads(resp.read().decode("utf-8"))
-            return resp.getcode(), body
-    except urllib.error.HTTPError as e:
-        body_bytes = e.read()
-        try:
-            body = json.loads(body_bytes.decode("utf-8"))
-        except Exception:
-            body = {"raw": body_bytes.decode("utf-8", errors="replace")[:500]}
-        return e.code, body
+        body_bytes = resp.read()
+    finally:
+        _pool.release(key, conn, resp)
+    if resp.status < 400:
+        return resp.status, loads_json(body_bytes)
+    try:
+        body = loads_json(body_bytes)
+    except Exception:
+        body = {"raw": body_bytes.decode("utf-8", errors="replace")[:500]}
+    return resp.status, body
 
 
 def http_request(
@@ -235,64 +301,79 @@ def http_request(
     timeout_s: float = 60.0,
     ssl_context: Optional[ssl.SSLContext] = None,
     method: str = "GET",
+    max_bytes: Optional[int] = None,
 ) -> "RequestResult":
-    """Generic HTTP request that streams the body and measures timings."""
-    req = urllib.request.Request(url=url, method=method, headers=headers)
+    """
+    Generic HTTP request that streams the body and measures timings.
+    With max_bytes, stops reading once that many body bytes have arrived.
+
+    Stages are measured from the start of the request: connect_s (new
+    connection setup, 0 on reuse), headers_s (response headers parsed) and
+    ttfb_s (first body byte; headers_s when there is no body to count).
+    """
+    conn = None
     start = time.perf_counter()
     try:
-        with urllib.request.urlopen(req, timeout=timeout_s, context=ssl_context) as resp:
-            ttfb = time.perf_counter() - start
-            status = resp.getcode()
-            resp_headers = {k.lower(): v for k, v in resp.headers.items()}
-            bytes_read = 0
-            while True:
-                buf = resp.read(128 * 1024)
-                if not buf:
+        key, conn, resp, connect_s = _pool.request(method, url, headers, timeout_s, ssl_context)
+        headers_s = time.perf_counter() - start
+        ttfb = headers_s
+        status = resp.status
+        resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+        bytes_read = 0
+        error = None
+        if status >= 400:
+            # Same result urllib's HTTPError gave: body drained but not counted.
+            resp.read()
+            error = f"HTTP Error {status}: {resp.reason}"
+        else:
+            # read1 returns as soon as any body bytes are available.
+            n = len(resp.read1(128 * 1024))
+            if n:
+                ttfb = time.perf_counter() - start
+            view = read_buffer()
+            while n:
+                bytes_read += n
+                if max_bytes is not None and bytes_read >= max_bytes:
                     break
-                bytes_read += len(buf)
-            elapsed = time.perf_counter() - start
-            return RequestResult(
-                status=status,
-                headers=resp_headers,
-                bytes_read=bytes_read,
-                elapsed_s=elapsed,
-                ttfb_s=ttfb,
-                error=None,
-            )
-    except urllib.error.HTTPError as e:
-        ttfb = time.perf_counter() - start
-        resp_headers = {k.lower(): v for k, v in e.headers.items()} if e.headers else {}
-        try:
-            _ = e.read()
-        except Exception:
-            pass
+                n = resp.readinto(view)
+            if resp.length == 0:
+                resp.read()  # body fully consumed: mark the connection reusable
         elapsed = time.perf_counter() - start
+        _pool.release(key, conn, resp)
         return RequestResult(
-            status=e.code,
+            status=status,
             headers=resp_headers,
-            bytes_read=0,
+            bytes_read=bytes_read,
             elapsed_s=elapsed,
+            connect_s=connect_s,
+            headers_s=headers_s,
             ttfb_s=ttfb,
-            error=str(e),
+            error=error,
         )
     except Exception as e:
+        if conn is not None:
+            conn.close()
         elapsed = time.perf_counter() - start
         return RequestResult(
             status=None,
             headers={},
             bytes_read=0,
             elapsed_s=elapsed,
+            connect_s=None,
+            headers_s=None,
             ttfb_s=None,
             error=str(e),
         )
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class RequestResult:
     status: Optional[int]
     headers: Dict[str, str]
     bytes_read: int
     elapsed_s: float
+    connect_s: Optional[float]
+    headers_s: Optional[float]
     ttfb_s: Optional[float]
     error: Optional[str]
 
@@ -341,33 +422,32 @@ def exchange_stream_token(
     url = f"{base_url}/auth/firebase/exchange"
     log("EXCH", f"Exchanging Firebase token at {url}")
 
-    req = urllib.request.Request(
-        url=url,
-        method="GET",
-        headers={"Authorization": f"Bearer {firebase_token}"},
-    )
     start = time.perf_counter()
+    key, conn, resp, _ = _pool.request(
+        "GET", url, {"Authorization": f"Bearer {firebase_token}"}, timeout_s, ssl_context
+    )
+    elapsed = time.perf_counter() - start
     try:
-        with urllib.request.urlopen(req, timeout=timeout_s, context=ssl_context) as resp:
-            elapsed = time.perf_counter() - start
-            body = json.loads(resp.read().decode("utf-8"))
-            stream_token = body.get("stream_token")
-            expires_at = body.get("expires_at")
-            if not stream_token:
-                raise RuntimeError("Exchange response missing 'stream_token'")
-            log("EXCH", f"OK in {elapsed*1000:.0f}ms – token len={len(stream_token)}, expires_at={expires_at}")
-            return stream_token, expires_at
-    except urllib.error.HTTPError as e:
-        elapsed = time.perf_counter() - start
-        error_body = e.read().decode("utf-8", errors="replace")[:300]
-        raise RuntimeError(f"Exchange failed (HTTP {e.code}) in {elapsed*1000:.0f}ms: {error_body}") from e
+        raw = resp.read()
+    finally:
+        _pool.release(key, conn, resp)
+    if resp.status >= 400:
+        error_body = raw.decode("utf-8", errors="replace")[:300]
+        raise RuntimeError(f"Exchange failed (HTTP {resp.status}) in {elapsed*1000:.0f}ms: {error_body}")
+    body = loads_json(raw)
+    stream_token = body.get("stream_token")
+    expires_at = body.get("expires_at")
+    if not stream_token:
+        raise RuntimeError("Exchange response missing 'stream_token'")
+    log("EXCH", f"OK in {elapsed*1000:.0f}ms – token len={len(stream_token)}, expires_at={expires_at}")
+    return stream_token, expires_at
 
 
 # ---------------------------------------------------------------------------
 # Streaming test data structures
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class StreamTestResult:
     message_id: int
     test_label: str
@@ -376,14 +456,16 @@ class StreamTestResult:
     bytes_read: int
     expected_bytes: int
     elapsed_s: float
+    connect_s: Optional[float]
+    headers_s: Optional[float]
     ttfb_s: Optional[float]
-    throughput_mbps: float
+    throughput_mbps: Optional[float]  # None for TTFB-only requests
     content_range: str
     error: Optional[str]
     worker_info: str  # parsed from response headers if available
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class MediaInfo:
     message_id: int
     total_size: Optional[int] = None
@@ -394,6 +476,12 @@ class MediaInfo:
 # Core streaming tests
 # ---------------------------------------------------------------------------
 
+@lru_cache(maxsize=256)
+def media_url(base_url: str, message_id: int, stream_token: str) -> str:
+    """The /direct URL of a media; built once and shared by every range request."""
+    return f"{base_url}/direct/{message_id}?st={stream_token}"
+
+
 def probe_media_size(
     base_url: str,
     message_id: int,
@@ -402,9 +490,10 @@ def probe_media_size(
     ssl_context: Optional[ssl.SSLContext],
 ) -> MediaInfo:
     """Discover media total size via a bytes=0-1 range request."""
-    url = f"{base_url}/direct/{message_id}?st={stream_token}"
+    url = media_url(base_url, message_id, stream_token)
     headers = {"Range": "bytes=0-1"}
-    result = http_request(url, headers, timeout_s=timeout_s, ssl_context=ssl_context)
+    # Stop after the two requested bytes even if the server ignores the Range.
+    result = http_request(url, headers, timeout_s=timeout_s, ssl_context=ssl_context, max_bytes=2)
 
     total_size = None
     content_range = result.headers.get("content-range", "")
@@ -424,6 +513,53 @@ def probe_media_size(
     )
 
 
+def probe_all(
+    base_url: str,
+    message_ids: List[int],
+    stream_token: str,
+    concurrency: int,
+    timeout_s: float,
+    ssl_context: Optional[ssl.SSLContext],
+) -> Dict[int, MediaInfo]:
+    """Probe every media concurrently; results are logged in message order."""
+    media_infos: Dict[int, MediaInfo] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            (mid, pool.submit(probe_media_size, base_url, mid, stream_token, timeout_s, ssl_context))
+            for mid in message_ids
+        ]
+        for mid, future in futures:
+            try:
+                info = future.result()
+                size_text = format_bytes(info.total_size) if info.total_size else "unknown"
+                log("PROBE", f"message_id={mid}  size={size_text}  type={info.content_type}")
+            except Exception as e:
+                log("WARN", f"Probe failed for message_id={mid}: {e}")
+                info = MediaInfo(message_id=mid)
+            media_infos[mid] = info
+    return media_infos
+
+
+def warm_up(
+    base_url: str,
+    message_id: int,
+    stream_token: str,
+    connections: int,
+    timeout_s: float,
+    ssl_context: Optional[ssl.SSLContext],
+) -> Tuple[List[float], RequestResult]:
+    """
+    Pre-open `connections` pooled connections and send one throwaway
+    bytes=0-0 request, so no timed test pays DNS + TCP + TLS setup.
+    Returns (connect times of new connections, the throwaway result); both
+    are for logging only and never enter the summaries.
+    """
+    url = media_url(base_url, message_id, stream_token)
+    connect_times = _pool.fill(url, connections, timeout_s, ssl_context)
+    result = http_request(url, {"Range": "bytes=0-0"}, timeout_s=timeout_s, ssl_context=ssl_context)
+    return connect_times, result
+
+
 def stream_range(
     base_url: str,
     message_id: int,
@@ -433,17 +569,24 @@ def stream_range(
     test_label: str,
     timeout_s: float,
     ssl_context: Optional[ssl.SSLContext],
+    ttfb_only: bool = False,
 ) -> StreamTestResult:
-    """Download a specific byte range and measure performance."""
-    url = f"{base_url}/direct/{message_id}?st={stream_token}"
+    """
+    Download a specific byte range and measure performance.
+    With ttfb_only, only the first TTFB_ONLY_BYTES of the range are requested
+    and no throughput is recorded: the transfer is too short to mean anything.
+    """
+    if ttfb_only:
+        range_end = min(range_end, range_start + TTFB_ONLY_BYTES - 1)
+    url = media_url(base_url, message_id, stream_token)
     range_spec = f"bytes={range_start}-{range_end}"
     headers = {"Range": range_spec}
     expected = range_end - range_start + 1
 
     result = http_request(url, headers, timeout_s=timeout_s, ssl_context=ssl_context)
 
-    throughput = 0.0
-    if result.elapsed_s > 0 and result.bytes_read > 0:
+    throughput: Optional[float] = None if ttfb_only else 0.0
+    if not ttfb_only and result.elapsed_s > 0 and result.bytes_read > 0:
         throughput = (result.bytes_read / (1024 * 1024)) / result.elapsed_s
 
     content_range = result.headers.get("content-range", "")
@@ -456,6 +599,8 @@ def stream_range(
         bytes_read=result.bytes_read,
         expected_bytes=expected,
         elapsed_s=result.elapsed_s,
+        connect_s=result.connect_s,
+        headers_s=result.headers_s,
         ttfb_s=result.ttfb_s,
         throughput_mbps=throughput,
         content_range=content_range,
@@ -500,6 +645,7 @@ def run_concurrent_burst(
     timeout_s: float,
     ssl_context: Optional[ssl.SSLContext],
     label: str = "burst",
+    ttfb_only: bool = False,
 ) -> List[StreamTestResult]:
     """Fire all message requests concurrently."""
     results: List[StreamTestResult] = []
@@ -511,6 +657,7 @@ def run_concurrent_burst(
             test_label=label,
             timeout_s=timeout_s,
             ssl_context=ssl_context,
+            ttfb_only=ttfb_only,
         )
 
     with ThreadPoolExecutor(max_workers=concurrency) as pool:
@@ -584,6 +731,7 @@ def run_same_media_concurrent(
     timeout_s: float,
     ssl_context: Optional[ssl.SSLContext],
     total_size: Optional[int],
+    ttfb_only: bool = False,
 ) -> List[StreamTestResult]:
     """
     Hammer a single media with multiple concurrent requests at different offsets.
@@ -613,6 +761,7 @@ def run_same_media_concurrent(
             test_label=label,
             timeout_s=timeout_s,
             ssl_context=ssl_context,
+            ttfb_only=ttfb_only,
         )
 
     with ThreadPoolExecutor(max_workers=concurrency) as pool:
@@ -645,27 +794,30 @@ def run_ramp_up(
     if max_concurrency not in levels:
         levels.append(max_concurrency)
 
-    for conc in levels:
-        # Pick conc messages (cycle if needed)
-        selected = []
-        for i in range(conc):
-            selected.append(message_ids[i % len(message_ids)])
-
-        label = f"ramp_c{conc}"
-        log("RAMP", f"concurrency={conc} → {len(selected)} requests")
-
-        batch_start = time.perf_counter()
-
-        def fetch(mid: int, lbl: str = label) -> StreamTestResult:
-            return stream_range(
-                base_url, mid, stream_token,
-                0, chunk_size - 1,
-                test_label=lbl,
-                timeout_s=timeout_s,
-                ssl_context=ssl_context,
-            )
+    # One executor for every level: worker threads survive between levels
+    # instead of being started and torn down eight times.
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        for conc in levels:
+            # Pick conc messages (cycle if needed)
+            selected = []
+            for i in range(conc):
+                selected.append(message_ids[i % len(message_ids)])
+
+            label = f"ramp_c{conc}"
+            log("RAMP", f"concurrency={conc} → {len(selected)} requests")
+
+            batch_start = time.perf_counter()
+
+            def fetch(mid: int, lbl: str = label) -> StreamTestResult:
+                return stream_range(
+                    base_url, mid, stream_token,
+                    0, chunk_size - 1,
+                    test_label=lbl,
+                    timeout_s=timeout_s,
+                    ssl_context=ssl_context,
+                )
 
-        with ThreadPoolExecutor(max_workers=conc) as pool:
+            # Only conc requests are submitted, so at most conc run at once.
             futures = {pool.submit(fetch, mid): mid for mid in selected}
             batch_results = []
             for future in as_completed(futures):
@@ -673,19 +825,20 @@ def run_ramp_up(
                 log_result(r)
                 batch_results.append(r)
 
-        batch_elapsed = time.perf_counter() - batch_start
-        ok_results = [r for r in batch_results if r.status in (200, 206) and r.error is None]
-        if ok_results:
-            avg_ttfb = sum(r.ttfb_s for r in ok_results if r.ttfb_s) / len(ok_results) * 1000
-            avg_rate = sum(r.throughput_mbps for r in ok_results) / len(ok_results)
-            log(
-                "RAMP",
-                f"c={conc:>2d} → ok={len(ok_results)}/{len(batch_results)} "
-                f"avg_ttfb={avg_ttfb:.0f}ms  avg_rate={avg_rate:.2f} MB/s  "
-                f"wall={batch_elapsed:.1f}s",
-            )
-        results.extend(batch_results)
-        time.sleep(0.5)  # brief cooldown between levels
+            batch_elapsed = time.perf_counter() - batch_start
+            ok_results = [r for r in batch_results if r.status in (200, 206) and r.error is None]
+            if ok_results:
+                avg_ttfb = sum(r.ttfb_s for r in ok_results if r.ttfb_s) / len(ok_results) * 1000
+                rates = rate_samples(ok_results)
+                avg_rate = sum(rates) / len(rates) if rates else 0.0
+                log(
+                    "RAMP",
+                    f"c={conc:>2d} → ok={len(ok_results)}/{len(batch_results)} "
+                    f"avg_ttfb={avg_ttfb:.0f}ms  avg_rate={avg_rate:.2f} MB/s  "
+                    f"wall={batch_elapsed:.1f}s",
+                )
+            results.extend(batch_results)
+            time.sleep(0.5)  # brief cooldown between levels
 
     return results
 
@@ -696,15 +849,19 @@ def run_ramp_up(
 
 def log_result(r: StreamTestResult) -> None:
     status = r.status or "ERR"
+    connect_ms = r.connect_s * 1000 if r.connect_s else 0
+    headers_ms = r.headers_s * 1000 if r.headers_s else 0
     ttfb_ms = r.ttfb_s * 1000 if r.ttfb_s else 0
     ok = "✓" if r.status in (200, 206) and r.error is None else "✗"
     error_text = f" err={r.error}" if r.error else ""
+    rate_text = f"{r.throughput_mbps:>7.2f}" if r.throughput_mbps is not None else f"{'n/a':>7s}"
     log(
         "REQ",
         f"{ok} msg={r.message_id} [{r.test_label:>15s}] {r.range_spec:<25s} "
         f"status={status} bytes={r.bytes_read:>12,}/{r.expected_bytes:>12,} "
+        f"connect={connect_ms:>5.0f}ms headers={headers_ms:>7.0f}ms "
         f"ttfb={ttfb_ms:>7.0f}ms elapsed={r.elapsed_s*1000:>8.0f}ms "
-        f"rate={r.throughput_mbps:>7.2f} MB/s{error_text}",
+        f"rate={rate_text} MB/s{error_text}",
     )
 
 
@@ -718,18 +875,64 @@ def format_bytes(n: int) -> str:
     return f"{n} B"
 
 
+def describe(values: List[float]) -> Tuple[float, float, float, float, float]:
+    """(min, avg, max, p50, p95) of a non-empty list, all from a single sort."""
+    s = sorted(values)
+    n = len(s)
+    return s[0], sum(values) / n, s[-1], s[n // 2], s[int(n * 0.95)]
+
+
+def format_stages(results: List[StreamTestResult]) -> str:
+    """p50/p95 of each request stage in ms, to tell setup, queueing and transfer apart."""
+    parts = []
+    for name, values in (
+        ("connect", [r.connect_s for r in results if r.connect_s is not None]),
+        ("headers", [r.headers_s for r in results if r.headers_s is not None]),
+        ("ttfb", [r.ttfb_s for r in results if r.ttfb_s is not None]),
+        ("total", [r.elapsed_s for r in results]),
+    ):
+        if values:
+            _, _, _, p50, p95 = describe(values)
+            parts.append(f"{name} p50={p50*1000:.0f}ms p95={p95*1000:.0f}ms")
+    return "  ".join(parts)
+
+
+def rate_samples(results: List[StreamTestResult]) -> List[float]:
+    """Per-request rates that carry information: no TTFB-only or zero-byte entries."""
+    return [r.throughput_mbps for r in results if r.throughput_mbps]
+
+
+def weighted_rate(results: List[StreamTestResult]) -> float:
+    """Bytes moved over time spent, in MB/s; unlike a mean of rates, long transfers weigh more."""
+    elapsed = sum(r.elapsed_s for r in results if r.throughput_mbps)
+    if elapsed <= 0:
+        return 0.0
+    return sum(r.bytes_read for r in results if r.throughput_mbps) / (1024 * 1024) / elapsed
+
+
 def print_summary(all_results: List[StreamTestResult], media_infos: Dict[int, MediaInfo]) -> None:
+    flush_logs()
     print(f"\n{hr('═')}")
     print("  PERFORMANCE SUMMARY")
     print(hr("═"))
 
-    # Group by test label
+    # One pass groups every result, and its OK subset, by label and by media.
     by_label: Dict[str, List[StreamTestResult]] = {}
+    by_media: Dict[int, List[StreamTestResult]] = {}
+    ok_by_label: Dict[str, List[StreamTestResult]] = {}
+    ok_by_media: Dict[int, List[StreamTestResult]] = {}
+    all_ok: List[StreamTestResult] = []
     for r in all_results:
         by_label.setdefault(r.test_label, []).append(r)
+        by_media.setdefault(r.message_id, []).append(r)
+        if r.status in (200, 206) and r.error is None:
+            ok_by_label.setdefault(r.test_label, []).append(r)
+            ok_by_media.setdefault(r.message_id, []).append(r)
+            all_ok.append(r)
 
+    # Group by test label
     for label, results in sorted(by_label.items()):
-        ok_results = [r for r in results if r.status in (200, 206) and r.error is None]
+        ok_results = ok_by_label.get(label, [])
         failed = len(results) - len(ok_results)
         if not ok_results:
             print(f"\n  [{label}] All {len(results)} requests FAILED")
@@ -737,43 +940,44 @@ def print_summary(all_results: List[StreamTestResult], media_infos: Dict[int, Me
 
         ttfbs = [r.ttfb_s * 1000 for r in ok_results if r.ttfb_s is not None]
         elapsed = [r.elapsed_s * 1000 for r in ok_results]
-        rates = [r.throughput_mbps for r in ok_results]
+        rates = rate_samples(ok_results)
         total_bytes = sum(r.bytes_read for r in ok_results)
 
         print(f"\n  [{label}] {len(ok_results)} OK / {failed} FAILED")
         print(f"  {'':>4s} Total bytes: {format_bytes(total_bytes)}")
         if ttfbs:
+            lo, avg, hi, p50, _ = describe(ttfbs)
             print(
-                f"  {'':>4s} TTFB   → min={min(ttfbs):>7.0f}ms  avg={sum(ttfbs)/len(ttfbs):>7.0f}ms  "
-                f"max={max(ttfbs):>7.0f}ms  p50={sorted(ttfbs)[len(ttfbs)//2]:>7.0f}ms"
+                f"  {'':>4s} TTFB   → min={lo:>7.0f}ms  avg={avg:>7.0f}ms  "
+                f"max={hi:>7.0f}ms  p50={p50:>7.0f}ms"
             )
         if elapsed:
+            lo, avg, hi, p50, _ = describe(elapsed)
             print(
-                f"  {'':>4s} Total  → min={min(elapsed):>7.0f}ms  avg={sum(elapsed)/len(elapsed):>7.0f}ms  "
-                f"max={max(elapsed):>7.0f}ms  p50={sorted(elapsed)[len(elapsed)//2]:>7.0f}ms"
+                f"  {'':>4s} Total  → min={lo:>7.0f}ms  avg={avg:>7.0f}ms  "
+                f"max={hi:>7.0f}ms  p50={p50:>7.0f}ms"
             )
         if rates:
+            lo, avg, hi, p50, _ = describe(rates)
             print(
-                f"  {'':>4s} Rate   → min={min(rates):>7.2f}     avg={sum(rates)/len(rates):>7.2f}     "
-                f"max={max(rates):>7.2f}     p50={sorted(rates)[len(rates)//2]:>7.2f} MB/s"
+                f"  {'':>4s} Rate   → min={lo:>7.2f}     avg={avg:>7.2f}     "
+                f"max={hi:>7.2f}     p50={p50:>7.2f}     "
+                f"weighted={weighted_rate(ok_results):>7.2f} MB/s"
             )
+        print(f"  {'':>4s} Stages → {format_stages(ok_results)}")
 
     # Group by message_id
     print(f"\n{hr('─')}")
     print("  PER-MEDIA BREAKDOWN")
     print(hr("─"))
 
-    by_media: Dict[int, List[StreamTestResult]] = {}
-    for r in all_results:
-        by_media.setdefault(r.message_id, []).append(r)
-
     for mid in sorted(by_media.keys()):
         results = by_media[mid]
         info = media_infos.get(mid)
         size_text = format_bytes(info.total_size) if info and info.total_size else "unknown"
         ctype = info.content_type if info and info.content_type else "?"
 
-        ok_results = [r for r in results if r.status in (200, 206) and r.error is None]
+        ok_results = ok_by_media.get(mid, [])
         failed = len(results) - len(ok_results)
 
         print(f"\n  message_id={mid}  size={size_text}  type={ctype}")
@@ -781,47 +985,104 @@ def print_summary(all_results: List[StreamTestResult], media_infos: Dict[int, Me
 
         if ok_results:
             ttfbs = [r.ttfb_s * 1000 for r in ok_results if r.ttfb_s is not None]
-            rates = [r.throughput_mbps for r in ok_results]
+            rates = rate_samples(ok_results)
             elapsed = [r.elapsed_s * 1000 for r in ok_results]
             if ttfbs:
+                lo, avg, hi, _, _ = describe(ttfbs)
                 print(
-                    f"  {'':>4s} TTFB   → min={min(ttfbs):>7.0f}ms  avg={sum(ttfbs)/len(ttfbs):>7.0f}ms  "
-                    f"max={max(ttfbs):>7.0f}ms"
+                    f"  {'':>4s} TTFB   → min={lo:>7.0f}ms  avg={avg:>7.0f}ms  "
+                    f"max={hi:>7.0f}ms"
                 )
             if elapsed:
+                lo, avg, hi, _, _ = describe(elapsed)
                 print(
-                    f"  {'':>4s} Total  → min={min(elapsed):>7.0f}ms  avg={sum(elapsed)/len(elapsed):>7.0f}ms  "
-                    f"max={max(elapsed):>7.0f}ms"
+                    f"  {'':>4s} Total  → min={lo:>7.0f}ms  avg={avg:>7.0f}ms  "
+                    f"max={hi:>7.0f}ms"
                 )
             if rates:
+                lo, avg, hi, _, _ = describe(rates)
                 print(
-                    f"  {'':>4s} Rate   → min={min(rates):>7.2f}     avg={sum(rates)/len(rates):>7.2f}     "
-                    f"max={max(rates):>7.2f} MB/s"
+                    f"  {'':>4s} Rate   → min={lo:>7.2f}     avg={avg:>7.2f}     "
+                    f"max={hi:>7.2f} MB/s"
                 )
 
     # Overall
     print(f"\n{hr('─')}")
-    all_ok = [r for r in all_results if r.status in (200, 206) and r.error is None]
     all_failed = len(all_results) - len(all_ok)
     print(
         f"  OVERALL: {len(all_ok)} OK / {all_failed} FAILED / {len(all_results)} total requests"
     )
     if all_ok:
         all_ttfbs = [r.ttfb_s * 1000 for r in all_ok if r.ttfb_s is not None]
-        all_rates = [r.throughput_mbps for r in all_ok]
+        all_rates = rate_samples(all_ok)
         if all_ttfbs:
+            lo, avg, hi, _, p95 = describe(all_ttfbs)
             print(
-                f"  {'':>4s} TTFB   → min={min(all_ttfbs):>7.0f}ms  avg={sum(all_ttfbs)/len(all_ttfbs):>7.0f}ms  "
-                f"max={max(all_ttfbs):>7.0f}ms  p95={sorted(all_ttfbs)[int(len(all_ttfbs)*0.95)]:>7.0f}ms"
+                f"  {'':>4s} TTFB   → min={lo:>7.0f}ms  avg={avg:>7.0f}ms  "
+                f"max={hi:>7.0f}ms  p95={p95:>7.0f}ms"
             )
         if all_rates:
+            lo, avg, hi, p50, _ = describe(all_rates)
             print(
-                f"  {'':>4s} Rate   → min={min(all_rates):>7.2f}     avg={sum(all_rates)/len(all_rates):>7.2f}     "
-                f"max={max(all_rates):>7.2f}     p50={sorted(all_rates)[len(all_rates)//2]:>7.2f} MB/s"
+                f"  {'':>4s} Rate   → min={lo:>7.2f}     avg={avg:>7.2f}     "
+                f"max={hi:>7.2f}     p50={p50:>7.2f}     "
+                f"weighted={weighted_rate(all_ok):>7.2f} MB/s"
             )
+        print(f"  {'':>4s} Stages → {format_stages(all_ok)}")
     print(hr("═"))
 
 
+# ---------------------------------------------------------------------------
+# Results file
+# ---------------------------------------------------------------------------
+
+def result_record(r: StreamTestResult) -> dict:
+    """The JSON record saved for one result."""
+    return {
+        "message_id": r.message_id,
+        "test_label": r.test_label,
+        "range_spec": r.range_spec,
+        "status": r.status,
+        "bytes_read": r.bytes_read,
+        "expected_bytes": r.expected_bytes,
+        "elapsed_s": round(r.elapsed_s, 4),
+        "connect_s": round(r.connect_s, 4) if r.connect_s is not None else None,
+        "headers_s": round(r.headers_s, 4) if r.headers_s is not None else None,
+        "ttfb_s": round(r.ttfb_s, 4) if r.ttfb_s else None,
+        "throughput_mbps": round(r.throughput_mbps, 4) if r.throughput_mbps is not None else None,
+        "error": r.error,
+    }
+
+
+def dumps_indented(value, indent: str = "") -> bytes:
+    """value as json.dumps(indent=2, ensure_ascii=False) would write it, nested under indent."""
+    if orjson:
+        text = orjson.dumps(value, option=orjson.OPT_INDENT_2)
+    else:
+        text = json.dumps(value, indent=2, ensure_ascii=False).encode("utf-8")
+    return text.replace(b"\n", b"\n" + indent.encode()) if indent else text
+
+
+def write_results(path: str, meta: dict, results: Iterable[StreamTestResult]) -> None:
+    """
+    Write meta plus a trailing "results" array, encoding one record at a time.
+
+    Only the record being written exists as a dict, instead of a list of one
+    dict per result; the file is byte-identical to json.dump(indent=2) of
+    {**meta, "results": [...]}.
+    """
+    with open(path, "wb") as f:
+        head = dumps_indented(meta)
+        f.write(head[:-2] + b",\n" if meta else b"{\n")
+        f.write(b'  "results": [')
+        sep = b"\n    "
+        for r in results:
+            f.write(sep)
+            f.write(dumps_indented(result_record(r), "    "))
+            sep = b",\n    "
+        f.write(b"\n  ]\n}" if sep != b"\n    " else b"]\n}")
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -869,6 +1130,14 @@ Examples:
         action="store_true",
         help="Disable TLS certificate verification",
     )
+    parser.add_argument(
+        "--ttfb-only",
+        action="store_true",
+        help=(
+            f"Burst and same_media request only {TTFB_ONLY_BYTES} bytes and record no "
+            "throughput (results are saved under a separate _ttfb file name)"
+        ),
+    )
 
     args = parser.parse_args()
 
@@ -883,6 +1152,8 @@ Examples:
     if not default_base_url:
         default_base_url = DEFAULT_BASE_URL
 
+    flush_logs()
+
     print(f"\n{hr('═')}")
     print("  TARGET SERVER")
     print(hr("═"))
@@ -897,6 +1168,7 @@ Examples:
     # Resolve Firebase API key
     firebase_api_key = args.firebase_api_key or os.getenv("FIREBASE_API_KEY")
     if not firebase_api_key:
+        flush_logs()
         firebase_api_key = input("Firebase Web API Key: ").strip()
     if not firebase_api_key:
         log("ERROR", "Firebase API key is required.")
@@ -920,6 +1192,8 @@ Examples:
 
     ssl_context = make_ssl_context(args.insecure)
 
+    flush_logs()
+
     print(f"\n{hr('═')}")
     print("  FIXED TEST PROFILE")
     print(hr("═"))
@@ -930,19 +1204,24 @@ Examples:
     print(f"  same_media_requests={same_media_requests}")
     print(f"  timeout={timeout_s:.0f}s")
     print(f"  tests={','.join(test_names)}")
+    if args.ttfb_only:
+        print(f"  ttfb_only=burst,same_media ({TTFB_ONLY_BYTES} bytes per request)")
 
     # ── Firebase authentication ──
+    flush_logs()
     print(f"\n{hr('═')}")
     print("  FIREBASE AUTHENTICATION")
     print(hr("═"))
 
     email = args.email
     if not email:
+        flush_logs()
         email = input("Firebase Email: ").strip()
     if not email:
         log("ERROR", "Email is required.")
         return 2
 
+    flush_logs()
     password = getpass.getpass("Firebase Password: ")
     if not password:
         log("ERROR", "Password is required.")
@@ -966,27 +1245,42 @@ Examples:
         log("ERROR", f"Token exchange failed: {e}")
         return 1
 
+    # ── Warm the connection pool (excluded from all results) ──
+    warm_start = time.perf_counter()
+    try:
+        connect_times, warm = warm_up(
+            base_url, message_ids[0], stream_token, concurrency, timeout_s, ssl_context
+        )
+        warm_elapsed = time.perf_counter() - warm_start
+        max_connect_ms = max(connect_times) * 1000 if connect_times else 0
+        log(
+            "WARM",
+            f"{len(connect_times)} new connections (slowest {max_connect_ms:.0f}ms), "
+            f"first request status={warm.status} ttfb={(warm.ttfb_s or 0)*1000:.0f}ms, "
+            f"total {warm_elapsed*1000:.0f}ms (not included in results)",
+        )
+        if warm.error:
+            log("WARN", f"Warm-up request failed: {warm.error}")
+    except Exception as e:
+        log("WARN", f"Warm-up failed: {e}")
+
     # ── Probe all media sizes ──
+    flush_logs()
     print(f"\n{hr('═')}")
     print("  PROBING MEDIA SIZES")
     print(hr("═"))
 
-    media_infos: Dict[int, MediaInfo] = {}
-    for mid in message_ids:
-        try:
-            info = probe_media_size(base_url, mid, stream_token, timeout_s, ssl_context)
-            media_infos[mid] = info
-            size_text = format_bytes(info.total_size) if info.total_size else "unknown"
-            log("PROBE", f"message_id={mid}  size={size_text}  type={info.content_type}")
-        except Exception as e:
-            log("WARN", f"Probe failed for message_id={mid}: {e}")
-            media_infos[mid] = MediaInfo(message_id=mid)
+    probe_start = time.perf_counter()
+    media_infos = probe_all(base_url, message_ids, stream_token, concurrency, timeout_s, ssl_context)
+    probe_elapsed = time.perf_counter() - probe_start
+    log("PROBE", f"{len(media_infos)} media probed in {probe_elapsed*1000:.0f}ms")
 
     # ── Run tests ──
     all_results: List[StreamTestResult] = []
 
     # Test 1: Sequential (baseline)
     if "sequential" in test_names:
+        flush_logs()
         print(f"\n{hr('═')}")
         print(f"  TEST 1: SEQUENTIAL (one request at a time, first {format_bytes(chunk_size)} of each media)")
         print(hr("═"))
@@ -1001,6 +1295,7 @@ Examples:
     if "burst" in test_names:
         for round_num in range(1, rounds + 1):
             round_label = f"burst_r{round_num}" if rounds > 1 else "burst"
+            flush_logs()
             print(f"\n{hr('═')}")
             print(
                 f"  TEST 2: CONCURRENT BURST (all {len(message_ids)} media at once, "
@@ -1013,6 +1308,7 @@ Examples:
                 base_url, message_ids, stream_token,
                 chunk_size, concurrency, timeout_s, ssl_context,
                 label=round_label,
+                ttfb_only=args.ttfb_only,
             )
             all_results.extend(burst_results)
 
@@ -1021,6 +1317,7 @@ Examples:
 
     # Test 3: Multi-chunk concurrent
     if "multi_chunk" in test_names:
+        flush_logs()
         print(f"\n{hr('═')}")
         print(
             f"  TEST 3: MULTI-CHUNK ({num_chunks} chunks × {len(message_ids)} media, "
@@ -1040,6 +1337,7 @@ Examples:
         target_mid = same_media_target_id
         target_info = media_infos.get(target_mid)
         total = target_info.total_size if target_info else None
+        flush_logs()
         print(f"\n{hr('═')}")
         print(
             f"  TEST 4: SAME MEDIA HAMMER (message_id={target_mid}, "
@@ -1051,11 +1349,13 @@ Examples:
             base_url, target_mid, stream_token,
             chunk_size, same_media_requests, concurrency,
             timeout_s, ssl_context, total,
+            ttfb_only=args.ttfb_only,
         )
         all_results.extend(sm_results)
 
     # Test 5: Ramp-up (concurrency scaling)
     if "ramp_up" in test_names:
+        flush_logs()
         print(f"\n{hr('═')}")
         print(
             f"  TEST 5: RAMP-UP (gradually increase concurrency 1→{concurrency}, "
@@ -1073,7 +1373,7 @@ Examples:
     print_summary(all_results, media_infos)
 
     # ── Save results to JSON (auto sequential path) ──
-    save_path = make_results_path(base_url)
+    save_path = make_results_path(base_url, ttfb_only=args.ttfb_only)
     save_data = {
         "timestamp": datetime.now().isoformat(),
         "base_url": base_url,
@@ -1091,6 +1391,7 @@ Examples:
             "same_media_requests": same_media_requests,
             "timeout_seconds": timeout_s,
             "same_media_id": same_media_target_id,
+            "ttfb_only": args.ttfb_only,
             "tests": test_names,
         },
         "media_info": {
@@ -1099,24 +1400,8 @@ Examples:
                 "content_type": info.content_type,
             } for mid, info in media_infos.items()
         },
-        "results": [
-            {
-                "message_id": r.message_id,
-                "test_label": r.test_label,
-                "range_spec": r.range_spec,
-                "status": r.status,
-                "bytes_read": r.bytes_read,
-                "expected_bytes": r.expected_bytes,
-                "elapsed_s": round(r.elapsed_s, 4),
-                "ttfb_s": round(r.ttfb_s, 4) if r.ttfb_s else None,
-                "throughput_mbps": round(r.throughput_mbps, 4),
-                "error": r.error,
-            }
-            for r in all_results
-        ],
     }
-    with open(save_path, "w", encoding="utf-8") as f:
-        json.dump(save_data, f, indent=2, ensure_ascii=False)
+    write_results(save_path, save_data, all_results)
     log("SAVE", f"Results saved to {save_path}")
 
     failed_count = sum(1 for r in all_results if r.status not in (200, 206) or r.error is not None)
@@ -8,25 +8,33 @@ Flow:
 3) Tests /direct/:message_id for a list of message IDs.
 4) Streams by HTTP range chunks and prints per-chunk timing/throughput.
 
+Chunks and messages are fetched one at a time by default; --concurrency and
+--message-concurrency opt in to parallel chunk and message fetching.
+
 No external dependencies required (Python stdlib only).
 """
 
 from __future__ import annotations
 
 import argparse
+import atexit
+import http.client
 import json
-import math
 import os
+import queue
 import ssl
 import sys
+import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 
+from _http_pool import ConnectionPool
+
 
 DEFAULT_MESSAGE_IDS = [
     523915,
@@ -43,13 +51,59 @@ DEFAULT_MESSAGE_IDS = [
     523926,
 ]
 
+# Chunk bodies are read into a reused per-thread buffer of this size.
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Chunk statuses worth retrying; other 5xx such as 501 are permanent.
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Idle keep-alive connections kept per server.
+DEFAULT_POOL_SIZE = 8
+
+# Log lines are queued by log() and written by one background thread, so
+# chunk workers never wait on the console.
+_log_queue: "queue.Queue[str]" = queue.Queue(maxsize=10000)
+_log_writer: Optional[threading.Thread] = None
+_log_writer_lock = threading.Lock()
+_thread_state = threading.local()
+
 
 def ts() -> str:
     return datetime.now().strftime("%H:%M:%S.%f")[:-3]
 
 
+def _write_logs() -> None:
+    """Writer thread: drain whatever is queued and write it in one call."""
+    while True:
+        batch = [_log_queue.get()]
+        try:
+            while True:
+                batch.append(_log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            sys.stdout.write("".join(batch))
+            sys.stdout.flush()
+        except Exception:
+            pass  # console gone (e.g. closed pipe); keep draining so flush_logs() returns
+        for _ in batch:
+            _log_queue.task_done()
+
+
+def flush_logs() -> None:
+    """Block until every queued log line is written."""
+    _log_queue.join()
+
+
 def log(level: str, message: str) -> None:
-    print(f"{ts()} [{level}] {message}", flush=True)
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = threading.Thread(target=_write_logs, name="log-writer", daemon=True)
+                _log_writer.start()
+                atexit.register(flush_logs)
+    _log_queue.put(f"{ts()} [{level}] {message}\n")
 
 
 def unquote_env_value(value: str) -> str:
@@ -110,7 +164,7 @@ def discover_default_env_file() -> Optional[str]:
 @dataclass
 class RequestMetrics:
     status: Optional[int]
-    headers: Dict[str, str]
+    headers: http.client.HTTPMessage  # case-insensitive .get()
     body: bytes
     elapsed_s: float
     ttfb_s: Optional[float]
@@ -125,9 +179,14 @@ class ChunkResult:
     end: int
     bytes_read: int
     elapsed_s: float
-    ttfb_s: Optional[float]
+    connect_s: Optional[float]  # TCP + TLS setup, 0.0 on a reused connection
+    headers_s: Optional[float]  # response headers parsed: the server's TTFB
+    ttfb_s: Optional[float]  # first body byte
     throughput_mbps: float
     error: Optional[str]
+    # Full media size and type as reported by the response, if it said.
+    total_size: Optional[int] = None
+    content_type: Optional[str] = None
 
 
 def normalize_base_url(value: str) -> str:
@@ -166,16 +225,6 @@ def parse_content_range_size(content_range: str) -> Optional[int]:
         return None
 
 
-def parse_int_header(headers: Dict[str, str], name: str) -> Optional[int]:
-    value = headers.get(name)
-    if value is None:
-        return None
-    try:
-        return int(value.strip())
-    except ValueError:
-        return None
-
-
 def build_url(base_url: str, path: str, query: Optional[Dict[str, str]] = None) -> str:
     url = f"{base_url}{path}"
     if not query:
@@ -184,15 +233,36 @@ def build_url(base_url: str, path: str, query: Optional[Dict[str, str]] = None)
     return f"{url}?{encoded}"
 
 
-def make_ssl_context(insecure: bool) -> Optional[ssl.SSLContext]:
-    if not insecure:
-        return None
+def make_ssl_context(insecure: bool) -> ssl.SSLContext:
+    """
+    The one TLS context every HTTPS connection of the run shares, so CA
+    certificates are loaded once and sessions can be resumed across them.
+    """
     ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
+    # Same ALPN offer http.client makes with its own per-connection contexts.
+    ctx.set_alpn_protocols(["http/1.1"])
+    if insecure:
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
     return ctx
 
 
+# Shared by every request in the run; main() raises maxsize to the peak in-flight count.
+_pool = ConnectionPool(maxsize=DEFAULT_POOL_SIZE)
+
+
+def read_buffer() -> memoryview:
+    """This thread's scratch buffer; bodies are only counted, so it is overwritten freely."""
+    view = getattr(_thread_state, "read_buffer", None)
+    if view is None:
+        view = _thread_state.read_buffer = memoryview(bytearray(READ_BUFFER_SIZE))
+    return view
+
+
+def http_error_text(resp: http.client.HTTPResponse) -> str:
+    return f"HTTP Error {resp.status}: {resp.reason}"
+
+
 def request_http(
     method: str,
     url: str,
@@ -201,43 +271,29 @@ def request_http(
     ssl_context: Optional[ssl.SSLContext],
     read_body: bool = True,
 ) -> RequestMetrics:
-    req = urllib.request.Request(url=url, method=method, headers=headers or {})
     start = time.perf_counter()
     try:
-        with urllib.request.urlopen(req, timeout=timeout_s, context=ssl_context) as resp:
+        key, conn, resp, _ = _pool.request(method, url, headers or {}, timeout_s, ssl_context)
+        try:
             ttfb = time.perf_counter() - start
-            status = resp.getcode()
-            resp_headers = {k.lower(): v for k, v in resp.headers.items()}
-            body = resp.read() if read_body else b""
+            # Bodyless responses (HEAD, 204) are finished here so the connection is reusable.
+            body = resp.read() if read_body or resp.length == 0 else b""
             elapsed = time.perf_counter() - start
-            return RequestMetrics(
-                status=status,
-                headers=resp_headers,
-                body=body,
-                elapsed_s=elapsed,
-                ttfb_s=ttfb,
-                error=None,
-            )
-    except urllib.error.HTTPError as e:
-        ttfb = time.perf_counter() - start
-        body = e.read() if read_body else b""
-        elapsed = time.perf_counter() - start
-        headers_map = {}
-        if e.headers:
-            headers_map = {k.lower(): v for k, v in e.headers.items()}
+        finally:
+            _pool.release(key, conn, resp)
         return RequestMetrics(
-            status=e.code,
-            headers=headers_map,
+            status=resp.status,
+            headers=resp.headers,
             body=body,
             elapsed_s=elapsed,
             ttfb_s=ttfb,
-            error=str(e),
+            error=http_error_text(resp) if resp.status >= 400 else None,
         )
     except Exception as e:
         elapsed = time.perf_counter() - start
         return RequestMetrics(
             status=None,
-            headers={},
+            headers=http.client.HTTPMessage(),
             body=b"",
             elapsed_s=elapsed,
             ttfb_s=None,
@@ -248,62 +304,86 @@ def request_http(
 def stream_range_chunk(
     url: str,
     headers: Dict[str, str],
+    start: int,
+    end: int,
     timeout_s: float,
     ssl_context: Optional[ssl.SSLContext],
 ) -> ChunkResult:
-    req = urllib.request.Request(url=url, method="GET", headers=headers)
-    start = time.perf_counter()
+    """
+    GET one byte range; headers must already carry the matching Range header.
+
+    Timings run from the start of the request, so connect_s (client-side
+    setup), headers_s (server response) and ttfb_s (first body byte) can be
+    told apart on cold and warm connections.
+    """
+    t0 = time.perf_counter()
     try:
-        with urllib.request.urlopen(req, timeout=timeout_s, context=ssl_context) as resp:
-            ttfb = time.perf_counter() - start
-            status = resp.getcode()
+        key, conn, resp, connect_s = _pool.request("GET", url, headers, timeout_s, ssl_context)
+        try:
+            headers_s = time.perf_counter() - t0
+            if resp.status >= 400:
+                # Drain the (small) error body so the connection goes back to
+                # the pool; retried 429/5xx responses then skip a new handshake.
+                resp.read()
+                elapsed = time.perf_counter() - t0
+                return ChunkResult(
+                    ok=False,
+                    status=resp.status,
+                    start=start,
+                    end=end,
+                    bytes_read=0,
+                    elapsed_s=elapsed,
+                    connect_s=connect_s,
+                    headers_s=headers_s,
+                    ttfb_s=None,
+                    throughput_mbps=0.0,
+                    error=http_error_text(resp),
+                )
+            status = resp.status
+            total_size = parse_content_range_size(resp.headers.get("content-range", ""))
+            if total_size is None and status == 200:
+                total_size = resp.length
+            content_type = resp.headers.get("content-type")
+            # read1 returns as soon as any body bytes are available.
+            n = len(resp.read1(128 * 1024))
+            ttfb = time.perf_counter() - t0 if n else headers_s
+            buf = read_buffer()
             bytes_read = 0
-            while True:
-                buf = resp.read(64 * 1024)
-                if not buf:
-                    break
-                bytes_read += len(buf)
-            elapsed = time.perf_counter() - start
-            throughput_mbps = (bytes_read / (1024 * 1024)) / elapsed if elapsed > 0 else 0.0
-            range_header = headers.get("Range", "bytes=0-0")
-            start_s, end_s = range_header.replace("bytes=", "").split("-", 1)
-            return ChunkResult(
-                ok=(status in (200, 206)),
-                status=status,
-                start=int(start_s),
-                end=int(end_s),
-                bytes_read=bytes_read,
-                elapsed_s=elapsed,
-                ttfb_s=ttfb,
-                throughput_mbps=throughput_mbps,
-                error=None,
-            )
-    except urllib.error.HTTPError as e:
-        elapsed = time.perf_counter() - start
-        range_header = headers.get("Range", "bytes=0-0")
-        start_s, end_s = range_header.replace("bytes=", "").split("-", 1)
+            while n:
+                bytes_read += n
+                n = resp.readinto(buf)
+            if resp.length == 0:
+                resp.read()  # body fully consumed: mark the connection reusable
+            elapsed = time.perf_counter() - t0
+        finally:
+            _pool.release(key, conn, resp)
+        throughput_mbps = (bytes_read / (1024 * 1024)) / elapsed if elapsed > 0 else 0.0
         return ChunkResult(
-            ok=False,
-            status=e.code,
-            start=int(start_s),
-            end=int(end_s),
-            bytes_read=0,
+            ok=(status in (200, 206)),
+            status=status,
+            start=start,
+            end=end,
+            bytes_read=bytes_read,
             elapsed_s=elapsed,
-            ttfb_s=None,
-            throughput_mbps=0.0,
-            error=str(e),
+            connect_s=connect_s,
+            headers_s=headers_s,
+            ttfb_s=ttfb,
+            throughput_mbps=throughput_mbps,
+            error=None,
+            total_size=total_size,
+            content_type=content_type,
         )
     except Exception as e:
-        elapsed = time.perf_counter() - start
-        range_header = headers.get("Range", "bytes=0-0")
-        start_s, end_s = range_header.replace("bytes=", "").split("-", 1)
+        elapsed = time.perf_counter() - t0
         return ChunkResult(
             ok=False,
             status=None,
-            start=int(start_s),
-            end=int(end_s),
+            start=start,
+            end=end,
             bytes_read=0,
             elapsed_s=elapsed,
+            connect_s=None,
+            headers_s=None,
             ttfb_s=None,
             throughput_mbps=0.0,
             error=str(e),
@@ -313,10 +393,8 @@ def stream_range_chunk(
 def should_retry(chunk: ChunkResult) -> bool:
     if chunk.ok:
         return False
-    if chunk.status is None:
-        return True
-    # Retry transient server/network errors.
-    return chunk.status >= 500 or chunk.status in (408, 425, 429)
+    # Retry network errors (no status) and transient server statuses.
+    return chunk.status is None or chunk.status in RETRY_STATUSES
 
 
 def exchange_stream_token(
@@ -325,7 +403,7 @@ def exchange_stream_token(
     timeout_s: float,
     ssl_context: Optional[ssl.SSLContext],
     exchange_path: str,
-) -> Tuple[str, Optional[int], Dict[str, str]]:
+) -> Tuple[str, Optional[int], http.client.HTTPMessage]:
     exchange_url = build_url(base_url, exchange_path)
     log("STEP", f"Exchange Firebase token -> {exchange_url}")
     headers = {"Authorization": f"Bearer {firebase_token}"}
@@ -381,10 +459,17 @@ def auth_headers_for_mode(auth_mode: str, stream_token: str) -> Dict[str, str]:
     raise ValueError(f"unknown auth mode: {auth_mode}")
 
 
+@lru_cache(maxsize=8)
+def stream_token_query(stream_token: str) -> str:
+    """The encoded st=<token> query; the token is fixed for the run, so encoded once."""
+    return urllib.parse.urlencode({"st": stream_token})
+
+
 def direct_url_for_mode(base_url: str, message_id: int, stream_token: str, auth_mode: str) -> str:
+    """Computed once per message; every chunk request of the message reuses it."""
     path = f"/direct/{message_id}"
     if auth_mode == "query":
-        return build_url(base_url, path, {"st": stream_token})
+        return f"{base_url}{path}?{stream_token_query(stream_token)}"
     return build_url(base_url, path)
 
 
@@ -399,62 +484,57 @@ def probe_message(
     ssl_context: Optional[ssl.SSLContext],
     retries: int,
     auth_mode: str,
+    concurrency: int,
 ) -> bool:
     url = direct_url_for_mode(base_url, message_id, stream_token, auth_mode)
     base_headers = auth_headers_for_mode(auth_mode, stream_token)
 
     log("MSG", f"message_id={message_id} mode={auth_mode} url={url}")
 
-    # HEAD probe
-    head = request_http(
-        method="HEAD",
-        url=url,
-        headers=base_headers,
-        timeout_s=timeout_s,
-        ssl_context=ssl_context,
-        read_body=False,
-    )
-    log(
-        "HEAD",
-        f"status={head.status} elapsed={head.elapsed_s*1000:.1f}ms content-length={head.headers.get('content-length', 'n/a')} content-type={head.headers.get('content-type', 'n/a')}",
-    )
+    def fetch_chunk(idx: int, start: int, end: int) -> ChunkResult:
+        # Built once per chunk and reused by its retries.
+        headers = {**base_headers, "Range": f"bytes={start}-{end}"}
 
-    total_size = parse_int_header(head.headers, "content-length")
-    if total_size is None:
-        total_size = parse_content_range_size(head.headers.get("content-range", ""))
+        attempt = 0
+        last: Optional[ChunkResult] = None
+        while attempt <= retries:
+            result = stream_range_chunk(
+                url=url, headers=headers, start=start, end=end, timeout_s=timeout_s, ssl_context=ssl_context
+            )
+            last = result
+            if result.ok or not should_retry(result) or attempt == retries:
+                break
+            sleep_s = 0.2 * (attempt + 1)
+            log(
+                "RETRY",
+                f"message_id={message_id} chunk=#{idx+1} range={start}-{end} attempt={attempt+1} status={result.status} err={result.error} waiting={sleep_s:.1f}s",
+            )
+            time.sleep(sleep_s)
+            attempt += 1
 
-    # If HEAD is not useful, probe with first byte request.
-    if total_size is None or (head.status is not None and head.status >= 400):
-        probe_headers = dict(base_headers)
-        probe_headers["Range"] = "bytes=0-0"
-        probe = stream_range_chunk(url=url, headers=probe_headers, timeout_s=timeout_s, ssl_context=ssl_context)
-        log(
-            "PROBE",
-            f"status={probe.status} elapsed={probe.elapsed_s*1000:.1f}ms bytes={probe.bytes_read} err={probe.error or 'none'}",
-        )
-        # Try to resolve total from probe via GET headers (Content-Range is not available in stream_range_chunk return).
-        # Run a light GET again just for header inspection.
-        probe_header_res = request_http(
-            method="GET",
-            url=url,
-            headers=probe_headers,
-            timeout_s=timeout_s,
-            ssl_context=ssl_context,
-            read_body=False,
-        )
-        if total_size is None:
-            total_size = parse_content_range_size(probe_header_res.headers.get("content-range", ""))
+        assert last is not None
+        return last
+
+    # The first chunk doubles as the size probe: its Content-Range (or the
+    # Content-Length of a plain 200) gives the total size, so no HEAD or
+    # bytes=0-0 round trip is needed before real data flows.
+    wall_start = time.perf_counter()
+    first = fetch_chunk(0, 0, chunk_size - 1)
+    total_size = first.total_size
 
     if total_size is not None:
-        log("INFO", f"message_id={message_id} total_size={total_size} bytes")
+        log(
+            "INFO",
+            f"message_id={message_id} total_size={total_size} bytes content-type={first.content_type or 'n/a'}",
+        )
     else:
         log("WARN", f"message_id={message_id} could not determine total size, using fixed chunk count")
 
     if full and total_size is not None:
-        target_chunks = int(math.ceil(total_size / chunk_size))
+        target_chunks = (total_size + chunk_size - 1) // chunk_size
     else:
         if total_size is not None:
-            max_chunks = int(math.ceil(total_size / chunk_size))
+            max_chunks = (total_size + chunk_size - 1) // chunk_size
             target_chunks = min(chunks_per_message, max_chunks)
         else:
             target_chunks = chunks_per_message
@@ -463,10 +543,7 @@ def probe_message(
         log("WARN", f"message_id={message_id} no chunks to test")
         return False
 
-    chunk_ok = 0
-    total_bytes = 0
-    total_elapsed = 0.0
-
+    ranges: List[Tuple[int, int]] = []
     for idx in range(target_chunks):
         start = idx * chunk_size
         if total_size is not None:
@@ -475,38 +552,30 @@ def probe_message(
                 break
         else:
             end = start + chunk_size - 1
+        ranges.append((start, end))
 
-        headers = dict(base_headers)
-        headers["Range"] = f"bytes={start}-{end}"
-
-        attempt = 0
-        last: Optional[ChunkResult] = None
-        while attempt <= retries:
-            result = stream_range_chunk(url=url, headers=headers, timeout_s=timeout_s, ssl_context=ssl_context)
-            last = result
-            if result.ok or not should_retry(result) or attempt == retries:
-                break
-            sleep_s = 0.2 * (attempt + 1)
-            log(
-                "RETRY",
-                f"message_id={message_id} chunk={idx+1}/{target_chunks} attempt={attempt+1} status={result.status} err={result.error} waiting={sleep_s:.1f}s",
-            )
-            time.sleep(sleep_s)
-            attempt += 1
+    chunk_ok = 0
+    total_bytes = 0
+    total_elapsed = 0.0
 
-        assert last is not None
+    def record(idx: int, last: ChunkResult) -> None:
+        nonlocal chunk_ok, total_bytes, total_elapsed
+        start, end = ranges[idx]
         expected = end - start + 1
         length_ok = last.bytes_read == expected or (last.status == 200 and last.bytes_read <= expected)
         ok = last.ok and length_ok
 
         status_text = f"status={last.status}" if last.status is not None else "status=n/a"
+        connect_ms = (last.connect_s * 1000) if last.connect_s is not None else 0.0
+        headers_ms = (last.headers_s * 1000) if last.headers_s is not None else 0.0
         ttfb_ms = (last.ttfb_s * 1000) if last.ttfb_s is not None else 0.0
         log(
             "CHUNK",
             (
                 f"msg={message_id} #{idx+1}/{target_chunks} range={start}-{end} "
                 f"{status_text} bytes={last.bytes_read}/{expected} "
-                f"elapsed={last.elapsed_s*1000:.1f}ms ttfb={ttfb_ms:.1f}ms "
+                f"elapsed={last.elapsed_s*1000:.1f}ms connect={connect_ms:.1f}ms "
+                f"headers={headers_ms:.1f}ms ttfb={ttfb_ms:.1f}ms "
                 f"rate={last.throughput_mbps:.2f} MB/s ok={ok} "
                 f"err={last.error or 'none'}"
             ),
@@ -517,14 +586,29 @@ def probe_message(
             total_bytes += last.bytes_read
             total_elapsed += last.elapsed_s
 
+    record(0, first)
+
+    # The remaining chunks are independent ranges; up to `concurrency` are in
+    # flight at once and each is logged as soon as it finishes.
+    if len(ranges) > 1:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(ranges) - 1)) as pool:
+            futures = {
+                pool.submit(fetch_chunk, idx, start, end): idx
+                for idx, (start, end) in enumerate(ranges)
+                if idx > 0
+            }
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
     if chunk_ok == 0:
         log("FAIL", f"message_id={message_id} all chunks failed")
         return False
 
+    wall_elapsed = time.perf_counter() - wall_start
     avg_rate = (total_bytes / (1024 * 1024)) / total_elapsed if total_elapsed > 0 else 0.0
     log(
         "DONE",
-        f"message_id={message_id} chunks_ok={chunk_ok}/{target_chunks} bytes={total_bytes} avg_rate={avg_rate:.2f} MB/s total_time={total_elapsed:.2f}s",
+        f"message_id={message_id} chunks_ok={chunk_ok}/{target_chunks} bytes={total_bytes} avg_rate={avg_rate:.2f} MB/s total_time={total_elapsed:.2f}s wall_time={wall_elapsed:.2f}s",
     )
     return chunk_ok == target_chunks
 
@@ -567,6 +651,21 @@ def main() -> int:
         action="store_true",
         help="Download all chunks for each message (can be slow for large files)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help=(
+            "Max chunk requests in flight per message (default: 1, one after "
+            "another); higher values fetch a message's chunks in parallel"
+        ),
+    )
+    parser.add_argument(
+        "--message-concurrency",
+        type=int,
+        default=1,
+        help="How many messages to test at once (default: 1, one after another)",
+    )
     parser.add_argument(
         "--timeout",
         type=float,
@@ -624,8 +723,15 @@ def main() -> int:
     if args.retries < 0:
         log("ERROR", "--retries must be >= 0")
         return 2
+    if args.concurrency <= 0:
+        log("ERROR", "--concurrency must be > 0")
+        return 2
+    if args.message_concurrency <= 0:
+        log("ERROR", "--message-concurrency must be > 0")
+        return 2
 
     ssl_context = make_ssl_context(args.insecure)
+    _pool.maxsize = max(DEFAULT_POOL_SIZE, args.message_concurrency * args.concurrency)
 
     log("INFO", f"base_url={base_url}")
     log("INFO", f"messages={messages}")
@@ -633,7 +739,9 @@ def main() -> int:
         "INFO",
         (
             f"chunk_size={args.chunk_size} bytes, chunks_per_message={args.chunks_per_message}, "
-            f"full={args.full}, timeout={args.timeout}s, retries={args.retries}, auth_mode={args.auth_mode}"
+            f"full={args.full}, concurrency={args.concurrency}, "
+            f"message_concurrency={args.message_concurrency}, timeout={args.timeout}s, "
+            f"retries={args.retries}, auth_mode={args.auth_mode}"
         ),
     )
 
@@ -656,23 +764,32 @@ def main() -> int:
     success = 0
     failed = 0
     start_all = time.perf_counter()
-    for message_id in messages:
-        ok = probe_message(
-            base_url=base_url,
-            message_id=message_id,
-            stream_token=stream_token,
-            chunk_size=args.chunk_size,
-            chunks_per_message=args.chunks_per_message,
-            full=args.full,
-            timeout_s=args.timeout,
-            ssl_context=ssl_context,
-            retries=args.retries,
-            auth_mode=args.auth_mode,
-        )
-        if ok:
-            success += 1
-        else:
-            failed += 1
+    # Up to --message-concurrency messages are probed at once, each with its
+    # own chunk workers, so at most that many times --concurrency requests
+    # are in flight.
+    with ThreadPoolExecutor(max_workers=args.message_concurrency) as pool:
+        futures = [
+            pool.submit(
+                probe_message,
+                base_url=base_url,
+                message_id=message_id,
+                stream_token=stream_token,
+                chunk_size=args.chunk_size,
+                chunks_per_message=args.chunks_per_message,
+                full=args.full,
+                timeout_s=args.timeout,
+                ssl_context=ssl_context,
+                retries=args.retries,
+                auth_mode=args.auth_mode,
+                concurrency=args.concurrency,
+            )
+            for message_id in messages
+        ]
+        for future in as_completed(futures):
+            if future.result():
+                success += 1
+            else:
+                failed += 1
 
     total_elapsed = time.perf_counter() - start_all
     log("SUMMARY", f"messages_ok={success} messages_failed={failed} total_time={total_elapsed:.2f}s")